@@ -0,0 +1,243 @@
+# This module implements the command-line mode of the spreadsheet application.
+# It runs the functions of spreadsheet.py on a CSV file without the web
+# interface, for example: python -m spreadsheet sum data.csv -c price
+# The input is read from a file or from stdin one line at a time, so only the
+# running results are kept in memory, even on very large files.
+# The results are written to stdout as CSV or JSON.
+
+import argparse
+import io
+import itertools
+import json
+import os
+import sys
+
+try:
+    from . import spreadsheet
+except ImportError:
+    import spreadsheet
+
+# statistics written by the stats command, in output order.
+STATS_KEYS = ['count', 'sum', 'mean', 'stddev', 'min', 'p25', 'median', 'p75', 'max']
+
+# returns a generator over the rows of the CSV file, one row at a time.
+# Each row is split on commas like in spreadsheet.csvtxt_to_data.
+
+def read_rows(file):
+    for line in file:
+        yield line.rstrip('\r\n').split(',')
+
+# raised when a command names a column that is not in the header.
+
+class UnknownColumnError(Exception):
+    pass
+
+# returns the index of the column 'name' in the header. 'name' is either
+# a column name or a column index (starting at 0). Raises
+# UnknownColumnError if there is no such column.
+
+def column_index(header, name):
+    if name in header:
+        return header.index(name)
+    if name.isdigit() and int(name) < len(header):
+        return int(name)
+    raise UnknownColumnError(f"unknown column: {name}")
+
+# returns the list of column indexes selected by 'columns', a comma separated
+# list of column names or indexes. All columns are selected if it is None.
+
+def select_columns(header, columns):
+    if columns is None:
+        return list(range(len(header)))
+    return list(map(lambda name: column_index(header, name), columns.split(',')))
+
+def format_csv_value(value):
+    return '' if value is None else str(value)
+
+# Writes the header and the rows to 'out' in the given format, one row at a
+# time. In JSON the rows are written as an array of objects keyed by the header.
+
+def write_table(out, fmt, header, rows):
+    if fmt == 'json':
+        out.write('[')
+        first = True
+        for row in rows:
+            out.write('\n' if first else ',\n')
+            out.write(json.dumps(dict(zip(header, row))))
+            first = False
+        out.write('\n]\n')
+    else:
+        out.write(','.join(header) + '\n')
+        for row in rows:
+            out.write(','.join(map(format_csv_value, row)) + '\n')
+
+def project(row, col_idxs):
+    return list(map(lambda c: row[c] if c < len(row) else '', col_idxs))
+
+def run_sum(args, header, rows, out):
+    col_idxs = select_columns(header, args.columns)
+    totals = spreadsheet.get_column_sums(rows, col_idxs)
+    write_table(out, args.format, project(header, col_idxs), [totals])
+
+def run_stats(args, header, rows, out):
+    col_idxs = select_columns(header, args.columns)
+    columns_stats = spreadsheet.get_column_stats(rows, col_idxs)
+    table = []
+    for key in STATS_KEYS:
+        table.append([key] + list(map(lambda s: s[key] if s is not None else None, columns_stats)))
+    write_table(out, args.format, ['stat'] + project(header, col_idxs), table)
+
+def run_groupby(args, header, rows, out):
+    col_idx = column_index(header, args.column)
+    target_col = None if args.value is None else column_index(header, args.value)
+    groups = spreadsheet.get_group_by_rows(rows, col_idx, target_col)
+    write_table(out, args.format, [header[col_idx], 'sum'], groups)
+
+def run_convert(args, header, rows, out):
+    col_idxs = select_columns(header, args.columns)
+    write_table(out, args.format, project(header, col_idxs),
+                map(lambda row: project(row, col_idxs), rows))
+
+def run_head(args, header, rows, out):
+    run_convert(args, header, itertools.islice(rows, args.lines), out)
+
+# argparse type for options that must be an integer >= 0.
+
+def non_negative_int(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more: {text}")
+    return value
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m spreadsheet',
+        description='Run spreadsheet operations on a CSV file without the web interface. '
+                    'Without a command, the web interface is started.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, run, help, fmt='csv', columns=True, group_column=False):
+        command = commands.add_parser(name, help=help)
+        if group_column:
+            command.add_argument('column', help='column to group by (name or index)')
+        command.add_argument('input', nargs='?', default='-',
+                             help='CSV file to read (default: stdin)')
+        command.add_argument('-e', '--encoding', default='utf-8',
+                             help='encoding of the CSV file (default: utf-8)')
+        if columns:
+            command.add_argument('-c', '--columns',
+                                 help='comma separated column names or indexes (default: all)')
+        command.add_argument('-f', '--format', choices=['csv', 'json'], default=fmt,
+                             help=f'output format (default: {fmt})')
+        command.set_defaults(run=run, command_parser=command)
+        return command
+
+    add_command('sum', run_sum, 'sum of the numeric values of each column')
+    add_command('stats', run_stats, 'statistics of the numeric values of each column')
+    groupby = add_command('groupby', run_groupby, 'sum of a column for each value of another column',
+                          columns=False, group_column=True)
+    groupby.add_argument('-v', '--value',
+                         help='column to sum in each group (default: same as the interface)')
+    add_command('convert', run_convert, 'write the table in another format', fmt='json')
+    head = add_command('head', run_head, 'write the first rows of the table')
+    head.add_argument('-n', '--lines', type=non_negative_int, default=10,
+                      help='number of rows to write (default: 10)')
+    return parser
+
+# returns the input file of the command, opened with its encoding.
+# The input '-' is stdin.
+
+def open_input(args):
+    if args.input == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding=args.encoding)
+    return open(args.input, encoding=args.encoding)
+
+# Writes an error message that is not about the command-line arguments
+# and returns the exit status for it.
+
+def fail(message):
+    sys.stderr.write(f"python -m spreadsheet: error: {message}\n")
+    return 1
+
+# Runs the command given by the command-line arguments 'argv'.
+# Returns the exit status of the program.
+
+def main(argv, out=sys.stdout):
+    args = build_parser().parse_args(argv)
+    name = 'stdin' if args.input == '-' else f"'{args.input}'"
+    try:
+        file = open_input(args)
+    except (OSError, LookupError) as exc:
+        args.command_parser.error(f"can't open {name}: {exc}")
+    try:
+        rows = read_rows(file)
+        header = next(rows, None)
+        if header is None:
+            return fail(f"{name} is empty, the first line must be the header")
+        args.run(args, header, rows, out)
+    except UnknownColumnError as exc:
+        args.command_parser.error(str(exc))
+    except UnicodeDecodeError as exc:
+        return fail(f"{name} is not valid {args.encoding} ({exc.reason}), "
+                    "use --encoding to give its encoding")
+    except BrokenPipeError:
+        # the reader of stdout (for example "head") stopped reading early.
+        # Send the rest of the output to devnull so that Python does not
+        # fail again when it flushes stdout at exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        file.close()
+    return 0
+
+# helper function for testing purposes: runs the command 'argv' on a
+# temporary CSV file containing 'text' and returns what it wrote.
+# The command must exit with 'status'.
+
+def run_test(argv, text, status=0, encoding='utf-8'):
+    import contextlib
+    import tempfile
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding=encoding, delete=False) as file:
+        file.write(text)
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stderr(io.StringIO()):
+            try:
+                res = main(argv + [file.name], out)
+            except SystemExit as exc:
+                res = exc.code
+        assert res == status
+    finally:
+        os.remove(file.name)
+    return out.getvalue()
+
+def test_sum_command():
+    text = "name,price,qty\na,10,1\nb,2.5,x\n"
+    assert run_test(['sum'], text) == "name,price,qty\n,12.5,1.0\n"
+    assert run_test(['sum', '-c', 'qty,1'], text) == "qty,price\n1.0,12.5\n"
+    assert json.loads(run_test(['sum', '-c', 'price', '-f', 'json'], text)) == [{'price': 12.5}]
+
+def test_groupby_command():
+    text = "name,price\na,10\nb,2\na,5\n"
+    assert run_test(['groupby', 'name'], text) == "name,sum\na,15.0\nb,2.0\n"
+
+def test_head_command():
+    text = "a,b\n1,2\n3,4\n5,6\n"
+    assert run_test(['head', '-n', '2', '-c', 'b'], text) == "b\n2\n4\n"
+    assert json.loads(run_test(['convert'], text))[2] == {'a': '5', 'b': '6'}
+    assert run_test(['head', '-n', '0'], text) == "a,b\n"
+    assert run_test(['head', '-n', '-1'], text, status=2) == ""
+
+def test_input_errors():
+    text = "prix,qté\n10,1\n"
+    assert run_test(['sum', '-c', 'nope'], text, status=2) == ""
+    assert run_test(['sum'], "", status=1) == ""
+    assert run_test(['stats', '-f', 'json'], "", status=1) == ""
+    assert run_test(['sum'], text, status=1, encoding='latin-1') == ""
+    assert run_test(['sum', '-e', 'latin-1'], text, encoding='latin-1') == "prix,qté\n10.0,1.0\n"
+
+if __name__ == "__main__":
+    test_sum_command()
+    test_groupby_command()
+    test_head_command()
+    test_input_errors()
@@ -21,6 +21,7 @@ def drop(files):
         name = file.filename
         content = file.content
         current_data = spreadsheet.csvtxt_to_data(content)
+        cancel_task('stats')
         file_name = document.querySelector('#file-name')
         if file_name:
             file_name.textContent = name
@@ -29,6 +30,7 @@ def drop(files):
 current_data = None
 selected_cell = None
 current_group_col = None
+current_tasks = {}
 
 # Starts the graphical interface, creates the HTML elements, and links event handlers
 def init():
@@ -43,8 +45,13 @@ def init():
     drop_file([])
     start()
 
+# Draws the table: the header right away, and the rows with a task.
+# A running statistics task is not stopped: the functions that change
+# current_data stop it themselves.
+
 def start():
     global current_data
+    cancel_task('table')
      
     document.querySelector('#spreadsheet').innerHTML = ''
 
@@ -62,18 +69,22 @@ def start():
     document.querySelector('#spreadsheet').appendChild(tab_head)
 
     tab_body = document.createElement('tbody')
-    data_rows = current_data['data']
-    for r in range(len(data_rows)):
-        row = document.createElement('tr')
-        for c in range(len(data_rows[r])):
-            cell_el = document.createElement('td')
-            cell_el.setAttribute('data-row', r)
-            cell_el.setAttribute('data-col', c)
-            cell_el.textContent = data_rows[r][c]
-            cell_el.addEventListener('click', lambda e, r=r, c=c: cell_clicked(r, c))
-            row.appendChild(cell_el)
-        tab_body.appendChild(row)
     document.querySelector('#spreadsheet').appendChild(tab_body)
+    data_rows = current_data['data']
+
+    def step(first, last):
+        for r in range(first, last):
+            row = document.createElement('tr')
+            for c in range(len(data_rows[r])):
+                cell_el = document.createElement('td')
+                cell_el.setAttribute('data-row', r)
+                cell_el.setAttribute('data-col', c)
+                cell_el.textContent = data_rows[r][c]
+                cell_el.addEventListener('click', lambda e, r=r, c=c: cell_clicked(r, c))
+                row.appendChild(cell_el)
+            tab_body.appendChild(row)
+
+    run_task('table', "Affichage", len(data_rows), step, lambda: None)
 
 def cell(row_idx, col_idx):
     selector = f'[data-row="{row_idx}"][data-col="{col_idx}"]'
@@ -109,11 +120,15 @@ def cell_editor_pressed(event):
             current_data['header'][col_idx] = new_value
         else:
             current_data['data'] = spreadsheet.update_cell(current_data['data'], row_idx, col_idx, new_value)
+            # a running statistics task reads the old rows: start it again
+            if 'stats' in current_tasks:
+                sum_button_clicked()
         selected_cell.textContent = new_value
 
 def new_sheet_button_clicked():
     global current_data, selected_cell
     current_data = spreadsheet.create_empty_data(20, 40)
+    cancel_task('stats')
     selected_cell = None
     document.querySelector('#selected-cell').textContent = "(X,Y)"
     document.querySelector('#cell-editor').value = ""
@@ -138,6 +153,7 @@ def add_row_before_button_clicked():
     if selected_cell is not None:
         row_idx = int(selected_cell.getAttribute('data-row'))
         current_data['data'] = spreadsheet.create_new_row(current_data['data'], row_idx)
+        cancel_task('stats')
         selected_cell = None
         document.querySelector('#selected-cell').textContent = "(X,Y)"
         document.querySelector('#cell-editor').value = ""
@@ -148,6 +164,7 @@ def add_row_after_button_clicked():
     if selected_cell is not None:
         row_idx = int(selected_cell.getAttribute('data-row'))
         current_data['data'] = spreadsheet.create_new_row(current_data['data'], row_idx + 1)
+        cancel_task('stats')
         selected_cell = None
         document.querySelector('#selected-cell').textContent = "(X,Y)"
         document.querySelector('#cell-editor').value = ""
@@ -159,6 +176,7 @@ def add_column_before_button_clicked():
         col_idx = int(selected_cell.getAttribute('data-col'))
         current_data['header'] = spreadsheet.create_new_header_column(current_data['header'], col_idx)
         current_data['data'] = spreadsheet.create_new_column(current_data['data'], col_idx)
+        cancel_task('stats')
         selected_cell = None
         document.querySelector('#selected-cell').textContent = "(X,Y)"
         document.querySelector('#cell-editor').value = ""
@@ -170,6 +188,7 @@ def add_column_after_button_clicked():
         col_idx = int(selected_cell.getAttribute('data-col'))
         current_data['header'] = spreadsheet.create_new_header_column(current_data['header'], col_idx + 1)
         current_data['data'] = spreadsheet.create_new_column(current_data['data'], col_idx + 1)
+        cancel_task('stats')
         selected_cell = None
         document.querySelector('#selected-cell').textContent = "(X,Y)"
         document.querySelector('#cell-editor').value = ""
@@ -180,6 +199,7 @@ def delete_row_button_clicked():
     if selected_cell is not None:
         row_idx = int(selected_cell.getAttribute('data-row'))
         current_data['data'] = spreadsheet.delete_row(current_data['data'], row_idx)
+        cancel_task('stats')
         selected_cell = None
         document.querySelector('#selected-cell').textContent = "(X,Y)"
         document.querySelector('#cell-editor').value = ""
@@ -191,30 +211,154 @@ def delete_column_button_clicked():
         col_idx = int(selected_cell.getAttribute('data-col'))
         current_data['header'] = spreadsheet.delete_header_column(current_data['header'], col_idx)
         current_data['data'] = spreadsheet.delete_column(current_data['data'], col_idx)
+        cancel_task('stats')
         selected_cell = None
         document.querySelector('#selected-cell').textContent = "(X,Y)"
         document.querySelector('#cell-editor').value = ""
         start()
 
+# Long computations (drawing the table, statistics, group by) run as tasks,
+# a few rows at a time. The first chunk of TASK_CHUNK_ROWS rows is processed
+# right away, then after each chunk the task updates the progress bar and
+# gives control back to the browser with setTimeout, so that scrolling,
+# selection and the cancel button keep working while it runs.
+# A task is a dictionary with a 'slot', a 'label', the number of rows to
+# process ('total'), the number already processed ('done'), a 'step' function
+# that processes the rows from index first to last, a 'finish' function called
+# at the end, and a 'cancel' function called when the user cancels it (tasks
+# without one, like drawing the table, cannot be cancelled by the user).
+# current_tasks holds the running task of each slot: 'table' for the tasks
+# that draw the table body, 'stats' for the statistics. Starting a task or
+# calling cancel_task replaces the task of its slot, and the remaining chunks
+# of the old task are then ignored.
+# (Codeboot cannot run the Python code in a web worker, so the work stays
+# on the page but never blocks it for more than one chunk.)
+
+TASK_CHUNK_ROWS = 1000
+
+def run_task(slot, label, total, step, finish, cancel=None):
+    cancel_task(slot)
+    task = {'slot': slot, 'label': label, 'total': total, 'done': 0,
+            'step': step, 'finish': finish, 'cancel': cancel}
+    current_tasks[slot] = task
+    task_tick(task)
+
+# Processes the next chunk of rows of the task. When all the rows are
+# processed, removes the task and calls its finish function.
+# returns True if the task still has rows to process.
+
+def task_step(task):
+    end = min(task['done'] + TASK_CHUNK_ROWS, task['total'])
+    task['step'](task['done'], end)
+    task['done'] = end
+    if end < task['total']:
+        update_progress()
+        return True
+    del current_tasks[task['slot']]
+    update_progress()
+    task['finish']()
+    return False
+
+def task_tick(task):
+    if current_tasks.get(task['slot']) is not task:
+        return
+    if task_step(task):
+        setTimeout(lambda: task_tick(task), 0)
+
+# Stops the task of the given slot, or all the tasks if slot is None.
+# The cancel functions are not called: the caller replaces the task or
+# redraws the table itself.
+
+def cancel_task(slot=None):
+    for task_slot in list(current_tasks.keys()):
+        if slot is None or task_slot == slot:
+            del current_tasks[task_slot]
+    update_progress()
+
+# Shows the progress of all the running tasks together: their labels, and
+# one bar for all their rows. Annuler is enabled if one of them can be
+# cancelled. The progress is hidden when no task runs.
+
+def update_progress():
+    tasks = list(current_tasks.values())
+    if not tasks:
+        document.querySelector('#task-progress').hidden = True
+        return
+    done = sum(map(lambda t: t['done'], tasks))
+    total = sum(map(lambda t: t['total'], tasks))
+    cancellable = list(filter(lambda t: t['cancel'] is not None, tasks))
+    document.querySelector('#task-progress').hidden = False
+    document.querySelector('#task-label').textContent = ', '.join(
+        map(lambda t: f"{t['label']} : {t['done']} / {t['total']} lignes", tasks))
+    document.querySelector('#task-progress-bar').value = done / total if total else 0
+    document.querySelector('#cancel-task-button').disabled = not cancellable
+
+def cancel_task_button_clicked():
+    for task in list(current_tasks.values()):
+        if task['cancel'] is not None:
+            cancel_task(task['slot'])
+            task['cancel']()
+
+# helper function for testing purposes: runs the current tasks (and the
+# tasks they start) to the end without giving control back to the browser.
+
+def run_tasks_to_end():
+    while current_tasks:
+        task_step(list(current_tasks.values())[0])
+
+# statistics shown by the stats rows, in display order, with their labels.
+STATS_ROWS = [
+    ('sum', 'Somme'),
+    ('count', 'Nombre'),
+    ('mean', 'Moyenne'),
+    ('stddev', 'Écart-type'),
+    ('min', 'Min'),
+    ('p25', 'Q1'),
+    ('median', 'Médiane'),
+    ('p75', 'Q3'),
+    ('max', 'Max'),
+]
+
 def sum_button_clicked():
     global current_data
-    sums_row = []
-    num_columns = len(current_data['header'])
-    for col_idx in range(num_columns):
-        result = spreadsheet.get_sum(current_data['data'], col_idx)
-        sums_row.append(str(result) if result is not None else "NaN")
+    data_rows = current_data['data']
+    col_idxs = list(range(len(current_data['header'])))
+    states = spreadsheet.create_column_stats(col_idxs)
 
+    def step(first, last):
+        spreadsheet.column_stats_add(states, data_rows[first:last], col_idxs)
+
+    # cancelling only drops the partial results, there is nothing to undo
+    run_task('stats', "Statistiques", len(data_rows), step,
+             lambda: show_stats(spreadsheet.column_stats_summary(states)), lambda: None)
+
+# returns the text shown for a statistic: rounded to 4 decimals,
+# or NaN if the column has no numeric values.
+
+def format_stat(value):
+    return 'NaN' if value is None else str(round(value, 4))
+
+# Shows the statistics below the table, one row per statistic.
+# The first cell of each row also gives the name of the statistic.
+
+def show_stats(columns_stats):
     if document.querySelector("#stats-row"):
         document.querySelector("#stats-row").remove()
 
-    tr = document.createElement('tr')
-    tr.id = "stats-row"
-    tr.classList.add('stats')
-    for value in sums_row:
-        td = document.createElement('td')
-        td.textContent = value
-        tr.appendChild(td)
-    document.querySelector('#spreadsheet tbody').appendChild(tr)
+    tfoot = document.createElement('tfoot')
+    tfoot.id = "stats-row"
+    tfoot.classList.add('stats-row')
+    for key, label in STATS_ROWS:
+        tr = document.createElement('tr')
+        tr.classList.add('stats')
+        for i in range(len(columns_stats)):
+            col_stats = columns_stats[i]
+            value = format_stat(col_stats[key] if col_stats is not None else None)
+            td = document.createElement('td')
+            td.textContent = f"{label} : {value}" if i == 0 else value
+            tr.appendChild(td)
+        tfoot.appendChild(tr)
+    document.querySelector('#spreadsheet').appendChild(tfoot)
     document.querySelector('#clear-stats-button').disabled = False
 
 def clear_stats_button_clicked():
@@ -222,6 +366,12 @@ def clear_stats_button_clicked():
         document.querySelector("#stats-row").remove()
     document.querySelector('#clear-stats-button').disabled = True
 
+# Groups the table on the column of the selected cell, in two tasks: the first
+# computes the sum of each group and the rows it contains, the second shows
+# each group header followed by its rows. Clicking again on the same column,
+# or cancelling with the Annuler button, shows the table without groups.
+# Grouping on another column while a group by runs replaces it.
+
 def group_by_button_clicked():
     global current_data, selected_cell, current_group_col
     if selected_cell is None:
@@ -231,25 +381,67 @@ def group_by_button_clicked():
         current_group_col = None
         start()
         return
+    cancel_task('table')
     current_group_col = col_idx
-    groups = spreadsheet.get_group_by(current_data['data'], col_idx)
-    document.querySelector('#spreadsheet tbody').innerHTML = ''
-    for group_val, group_sum in groups:
-        tr_head = document.createElement('tr')
-        tr_head.classList.add('group-header')        
-        td_head = document.createElement('td')
-        td_head.textContent = f"Group: {group_val} (Sum: {group_sum})"
-        td_head.setAttribute('colspan', str(len(current_data['header'])))
-        tr_head.appendChild(td_head)
-        document.querySelector('#spreadsheet tbody').appendChild(tr_head)
-        for row in current_data['data']:
-            if row[col_idx] == group_val:
+    data_rows = current_data['data']
+    groups = {}
+    members = {}
+
+    def step(first, last):
+        spreadsheet.group_by_add(groups, data_rows[first:last], col_idx)
+        for r in range(first, last):
+            if col_idx < len(data_rows[r]):
+                key = data_rows[r][col_idx]
+                if key not in members:
+                    members[key] = []
+                members[key].append(r)
+
+    run_task('table', "Grouper par", len(data_rows), step,
+             lambda: show_groups(data_rows, sorted(groups.items()), members),
+             cancel_group_by)
+
+# Shows each group header followed by the rows of that group. 'pos' is the
+# position of the next thing to show: the index of the group, and the index
+# of the row in that group (-1 for the group header).
+
+def show_groups(data_rows, groups, members):
+    tbody = document.querySelector('#spreadsheet tbody')
+    tbody.innerHTML = ''
+    total = len(groups) + sum(map(len, members.values()))
+    pos = {'group': 0, 'row': -1}
+
+    def step(first, last):
+        for i in range(first, last):
+            group_val, group_sum = groups[pos['group']]
+            group_rows = members[group_val]
+            if pos['row'] == -1:
+                tr_head = document.createElement('tr')
+                tr_head.classList.add('group-header')
+                td_head = document.createElement('td')
+                td_head.textContent = f"Group: {group_val} (Sum: {group_sum})"
+                td_head.setAttribute('colspan', str(len(current_data['header'])))
+                tr_head.appendChild(td_head)
+                tbody.appendChild(tr_head)
+            else:
                 tr = document.createElement('tr')
-                for cell_val in row:
+                for cell_val in data_rows[group_rows[pos['row']]]:
                     td = document.createElement('td')
                     td.textContent = cell_val
                     tr.appendChild(td)
-                document.querySelector('#spreadsheet tbody').appendChild(tr)
+                tbody.appendChild(tr)
+            pos['row'] += 1
+            if pos['row'] == len(group_rows):
+                pos['group'] += 1
+                pos['row'] = -1
+
+    run_task('table', "Affichage des groupes", total, step, lambda: None, cancel_group_by)
+
+# Called when the user cancels a group by: shows the table without groups.
+
+def cancel_group_by():
+    global current_group_col
+    current_group_col = None
+    start()
 
 # Testing functions
 def test_new_sheet_button_clicked():
@@ -287,11 +479,82 @@ def test_sum_button_clicked():
     stats_row = document.querySelector("#stats-row")
     assert stats_row is not None
     assert "30.5" in stats_row.textContent
+    assert "Moyenne : 15.25" in stats_row.textContent
+    assert "Écart-type : 7.4246" in stats_row.textContent
+
+def test_group_by_button_clicked():
+    global current_data, selected_cell, current_group_col
+    current_data = {'header': ['Nom', 'Prix'], 'data': [['a', '10'], ['b', '2'], ['a', '5']]}
+    current_group_col = None
+    start()
+    selected_cell = cell(0, 0)
+    group_by_button_clicked()
+    run_tasks_to_end()
+    text = document.querySelector('#spreadsheet tbody').textContent
+    assert "Group: a (Sum: 15.0)" in text
+    assert "Group: b (Sum: 2.0)" in text
+
+def test_cancel_task():
+    global current_data, selected_cell, current_group_col
+    current_data = {'header': ['Nom'], 'data': list(map(lambda i: [str(i)], range(3 * TASK_CHUNK_ROWS)))}
+    current_group_col = None
+    start()
+    selected_cell = cell(0, 0)
+    group_by_button_clicked()
+    assert current_tasks['table']['label'] == "Grouper par"
+    cancel_task_button_clicked()
+    assert current_group_col is None
+    assert current_tasks['table']['label'] == "Affichage"
+    run_tasks_to_end()
+    assert document.querySelector('#task-progress').hidden
+
+def test_group_by_replaces_running_group_by():
+    global current_data, selected_cell, current_group_col
+    current_data = {'header': ['Nom', 'Prix'],
+                    'data': list(map(lambda i: [str(i % 3), str(i)], range(3 * TASK_CHUNK_ROWS)))}
+    current_group_col = None
+    start()
+    selected_cell = cell(0, 0)
+    group_by_button_clicked()
+    selected_cell = cell(0, 1)
+    group_by_button_clicked()
+    run_tasks_to_end()
+    assert current_group_col == 1
+
+def test_redraw_keeps_stats_task():
+    global current_data, current_group_col
+    current_data = {'header': ['Nombres'], 'data': list(map(lambda i: [str(i)], range(3 * TASK_CHUNK_ROWS)))}
+    current_group_col = None
+    start()
+    sum_button_clicked()
+    start()
+    assert 'stats' in current_tasks
+    run_tasks_to_end()
+    assert document.querySelector("#stats-row") is not None
+
+def test_progress_of_all_tasks():
+    global current_data
+    current_data = {'header': ['Nombres'], 'data': list(map(lambda i: [str(i)], range(3 * TASK_CHUNK_ROWS)))}
+    start()
+    sum_button_clicked()
+    label = document.querySelector('#task-label').textContent
+    assert "Affichage" in label and "Statistiques" in label
+    task_step(current_tasks['table'])
+    assert not document.querySelector('#cancel-task-button').disabled
+    cancel_task_button_clicked()
+    assert 'stats' not in current_tasks and 'table' in current_tasks
+    assert document.querySelector('#cancel-task-button').disabled
+    run_tasks_to_end()
 
 if __name__ == "__main__":
     test_new_sheet_button_clicked()
     test_cell_clicked()
     test_delete_row_button_clicked()
-    test_sum_button_clicked()     
+    test_sum_button_clicked()
+    test_group_by_button_clicked()
+    test_cancel_task()
+    test_group_by_replaces_running_group_by()
+    test_redraw_keeps_stats_task()
+    test_progress_of_all_tasks()
 
 init()
@@ -9,6 +9,7 @@
 
 
 from functools import reduce
+import stats
 # fonctions imported:
 
 def split_lines(content):
@@ -163,52 +164,92 @@ def valid_number(s):
 
 def get_sum(data, col_idx):
     if not data or not (0 <= col_idx < len(data[0])): return None 
-    nums = []
-    for row in data:
-        val = row[col_idx]
-        if valid_number(val):
-            nums.append(float(val))
-    return sums(nums) if nums else None
+    return get_column_sums(data, [col_idx])[0]
+
+# returns a dictionary with the statistics (count, sum, mean, stddev, min, max,
+# p25, median, p75) of the numeric values in column 'col_idx', computed in a
+# single pass over the rows. If the column contains no numeric values,
+# the function returns None.
+
+def get_stats(data, col_idx):
+    if not data or not (0 <= col_idx < len(data[0])): return None
+    return get_column_stats(data, [col_idx])[0]
 
 # Groups the rows of the table based on the values in column 'col_idx'.
-# Returns a list of groups, where each group is a list of rows
-# that all share the same value in that column.
+# Returns a list of (value, sum) pairs sorted by value, where sum is the
+# sum of the numeric values of the first other column in the rows that
+# share that value.
 
 def get_group_by(data, col_idx):
-
     if not data or not (0 <= col_idx < len(data[0])): return []
-    target_col = 1 if col_idx == 0 else 0
-    sorted_rows = []
-
-    for r in data:
-        sorted_rows.append([r[col_idx]] + r)
-    sorted_rows.sort()
-
-    res = []
-    curr_val = None
-    curr_nums = []
-
-    for row in sorted_rows:
-
-        if row[0] != curr_val:
-            if curr_val is not None:
-                numeric = []
-
-                for v in curr_nums:
-                    if valid_number(v): numeric.append(float(v))
-                res.append((curr_val, sums(numeric) if numeric else 0.0))
-
-            curr_val = row[0]
-            curr_nums = []
-        curr_nums.append(row[target_col + 1])
-
-    if curr_val is not None:
-        numeric = []
-
-        for v in curr_nums:
-            if valid_number(v): numeric.append(float(v))
-        res.append((curr_val, sums(numeric) if numeric else 0.0))
-    return res
+    return get_group_by_rows(data, col_idx)
+
+# The following functions implement get_sum, get_stats and get_group_by.
+# 'rows' can be any iterable of rows (for example rows read one at a time
+# from a large CSV file). They go over the rows only once and
+# keep only the running results in memory, not the rows themselves.
+# Cells missing from a short row are ignored.
+
+# returns a list with the sum of the numeric values of each column in
+# 'col_idxs'. A column with no numeric values gets None, like get_sum.
+
+def get_column_sums(rows, col_idxs):
+    totals = [None] * len(col_idxs)
+    for row in rows:
+        for i in range(len(col_idxs)):
+            col_idx = col_idxs[i]
+            if col_idx < len(row) and valid_number(row[col_idx]):
+                totals[i] = (totals[i] or 0) + float(row[col_idx])
+    return totals
+
+# The statistics of several columns can also be computed a few rows at a
+# time: create_column_stats creates one state per column, column_stats_add
+# adds a group of rows to the states, and column_stats_summary returns the
+# statistics of each column (see get_stats). A column with no numeric
+# values gets None.
+
+def create_column_stats(col_idxs):
+    return list(map(lambda c: stats.create_stats(), col_idxs))
+
+def column_stats_add(states, rows, col_idxs):
+    for row in rows:
+        for i in range(len(col_idxs)):
+            col_idx = col_idxs[i]
+            if col_idx < len(row) and valid_number(row[col_idx]):
+                stats.stats_add(states[i], float(row[col_idx]))
+
+def column_stats_summary(states):
+    return list(map(lambda s: stats.stats_summary(s) if s['count'] else None, states))
+
+def get_column_stats(rows, col_idxs):
+    states = create_column_stats(col_idxs)
+    column_stats_add(states, rows, col_idxs)
+    return column_stats_summary(states)
+
+# Adds the rows to 'groups', a dictionary from each value of column 'col_idx'
+# to the running sum of the numeric values of column 'target_col' in the
+# rows with that value. By default 'target_col' is the column get_group_by sums.
+
+def group_by_add(groups, rows, col_idx, target_col=None):
+    if target_col is None:
+        target_col = 1 if col_idx == 0 else 0
+    for row in rows:
+        if col_idx >= len(row): continue
+        key = row[col_idx]
+        if key not in groups:
+            groups[key] = 0.0
+        if target_col < len(row) and valid_number(row[target_col]):
+            groups[key] += float(row[target_col])
+
+# Groups the rows on the values in column 'col_idx' and sums the numeric
+# values of column 'target_col' in each group (see group_by_add).
+# Returns a list of (value, sum) pairs sorted by value. Only one running
+# sum per distinct value is kept in memory.
+
+def get_group_by_rows(rows, col_idx, target_col=None):
+    groups = {}
+    group_by_add(groups, rows, col_idx, target_col)
+    return sorted(groups.items())
 
 # helper function to copy data for testing purposes
 # it creates and returns a  copy of the given  array 'data'.
@@ -323,11 +364,51 @@ def test_update_cell():
 def test_get_sum():
     data = [['10'], ['20']]
     assert get_sum(data, 0) == 30.0
+    assert get_sum([['abc']], 0) is None
+    assert get_sum(data, 1) is None
     
+def test_get_stats():
+    data = [['10'], ['abc'], ['20'], ['30']]
+    res = get_stats(data, 0)
+    assert res['count'] == 3
+    assert res['sum'] == 60.0
+    assert res['mean'] == 20.0
+    assert res['min'] == 10.0 and res['max'] == 30.0
+    assert res['median'] == 20.0
+    assert get_stats([['abc']], 0) is None
+
 def test_get_group_by():
     data = [['X', '10'], ['X', '5']]
     res = get_group_by(data, 0)
     assert res[0] == ('X', 15.0)
+    assert get_group_by([['X', '10'], ['Y', 'abc'], ['X']], 0) == [('X', 10.0), ('Y', 0.0)]
+    assert get_group_by([], 0) == []
+
+def test_get_column_sums():
+    rows = [['10', 'a'], ['20', '1.5'], ['x']]
+    assert get_column_sums(iter(rows), [0, 1]) == [30.0, 1.5]
+    assert get_column_sums(iter([['a']]), [0]) == [None]
+
+def test_get_column_stats():
+    rows = [['10', 'a'], ['20', 'b'], ['30', 'c']]
+    res = get_column_stats(iter(rows), [0, 1])
+    assert res[0] == get_stats(rows, 0)
+    assert res[1] is None
+
+    states = create_column_stats([0])
+    column_stats_add(states, rows[:2], [0])
+    column_stats_add(states, rows[2:], [0])
+    assert column_stats_summary(states) == [res[0]]
+
+def test_get_group_by_rows():
+    data = [['X', '10'], ['Y', '2'], ['X', '5'], ['Y', 'abc']]
+    assert get_group_by_rows(iter(data), 0) == [('X', 15.0), ('Y', 2.0)]
+    assert get_group_by_rows(iter(data), 1, 1) == [('10', 10.0), ('2', 2.0), ('5', 5.0), ('abc', 0.0)]
+
+    groups = {}
+    group_by_add(groups, data[:1], 0)
+    group_by_add(groups, data[1:], 0)
+    assert sorted(groups.items()) == [('X', 15.0), ('Y', 2.0)]
 
 if __name__ == "__main__":
     test_save_data() 
@@ -342,4 +423,8 @@ if __name__ == "__main__":
     test_delete_row()
     test_update_cell()
     test_get_sum()
+    test_get_stats()
     test_get_group_by()
+    test_get_column_sums()
+    test_get_column_stats()
+    test_get_group_by_rows()
@@ -0,0 +1,250 @@
+# This module computes column statistics in a single streaming pass.
+# A statistics state is a dictionary that is updated one value at a time.
+# The count, sum, min and max are kept directly, the mean and variance are
+# kept with Welford's algorithm, and the quantiles (median, percentiles) are
+# estimated with a KLL sketch whose memory stays bounded by the parameter k.
+# Two states can be merged, so a column can be split into partitions whose
+# states are computed separately and combined at the end.
+
+
+# default number of values kept by the top level of the quantile sketch.
+# Up to this many values nothing is compacted and the quantiles are exact.
+SKETCH_K = 200
+
+# Creates and returns an empty quantile sketch.
+# 'levels' is a list of levels, level h holds values that each stand for 2**h
+# original values. 'flips' remembers, for each level, which half of the
+# values was promoted the last time that level was compacted.
+# 'caps' holds the capacity of each level, 'size' and 'capacity' are the
+# number of values kept and allowed over all levels. They are kept up to date
+# so that adding a value does not have to go over the levels.
+
+def create_sketch(k):
+    sketch = {'k': k, 'levels': [[]], 'flips': [0], 'count': 0, 'size': 0}
+    update_capacities(sketch)
+    return sketch
+
+# returns the number of values that level 'h' of the sketch can hold
+# before it must be compacted. Lower levels get smaller capacities.
+
+def level_capacity(sketch, h):
+    depth = len(sketch['levels']) - 1 - h
+    return max(2, int(sketch['k'] * (2 / 3) ** depth))
+
+# Recomputes the capacities, which change when a level is added.
+
+def update_capacities(sketch):
+    sketch['caps'] = list(map(lambda h: level_capacity(sketch, h), range(len(sketch['levels']))))
+    sketch['capacity'] = sum(sketch['caps'])
+
+# Compacts the lowest level that is over capacity: its values are sorted
+# and every other one is promoted to the next level with twice the weight.
+# The starting offset alternates between compactions of the same level,
+# so the rounding errors cancel out instead of piling up.
+
+def compact_sketch(sketch):
+    levels = sketch['levels']
+    for h in range(len(levels)):
+        if len(levels[h]) > sketch['caps'][h]:
+            if h + 1 == len(levels):
+                levels.append([])
+                sketch['flips'].append(0)
+                update_capacities(sketch)
+            values = sorted(levels[h])
+            kept = []
+            if len(values) % 2 == 1:
+                kept = [values.pop()]
+            offset = sketch['flips'][h]
+            sketch['flips'][h] = 1 - offset
+            levels[h + 1].extend(values[offset::2])
+            levels[h] = kept
+            sketch['size'] -= len(values) // 2
+            return True
+    return False
+
+def sketch_size(sketch):
+    return sum(map(len, sketch['levels']))
+
+# Compacts the sketch until it holds no more values than its capacity.
+
+def compress_sketch(sketch):
+    while sketch['size'] > sketch['capacity']:
+        if not compact_sketch(sketch):
+            break
+
+# Adds the value x to the sketch, compacting it when it becomes too large.
+
+def sketch_add(sketch, x):
+    sketch['levels'][0].append(x)
+    sketch['count'] += 1
+    sketch['size'] += 1
+    if sketch['size'] > sketch['capacity']:
+        compress_sketch(sketch)
+
+# Creates and returns a new sketch holding the values of both sketches.
+
+def merge_sketches(a, b):
+    res = create_sketch(max(a['k'], b['k']))
+    num_levels = max(len(a['levels']), len(b['levels']))
+    res['levels'] = []
+    res['flips'] = []
+    for h in range(num_levels):
+        level = []
+        if h < len(a['levels']): level.extend(a['levels'][h])
+        if h < len(b['levels']): level.extend(b['levels'][h])
+        res['levels'].append(level)
+        res['flips'].append(a['flips'][h] if h < len(a['flips']) else 0)
+    res['count'] = a['count'] + b['count']
+    res['size'] = sketch_size(res)
+    update_capacities(res)
+    compress_sketch(res)
+    return res
+
+# returns the estimated q-quantile (0 <= q <= 1) of the values in the sketch,
+# or None if the sketch is empty. The median is the 0.5-quantile.
+# While nothing has been compacted the sketch holds every value, and the
+# quantile is interpolated between the two closest values, so that the
+# median of an even number of values is the mean of the two middle ones.
+
+def sketch_quantile(sketch, q):
+    if sketch['size'] == sketch['count']:
+        values = sorted(sketch['levels'][0])
+        if not values: return None
+        pos = q * (len(values) - 1)
+        i = int(pos)
+        if i + 1 == len(values): return values[i]
+        return values[i] + (values[i + 1] - values[i]) * (pos - i)
+    weighted = []
+    for h in range(len(sketch['levels'])):
+        for x in sketch['levels'][h]:
+            weighted.append((x, 2 ** h))
+    if not weighted: return None
+    weighted.sort()
+    total = sum(map(lambda p: p[1], weighted))
+    target = q * total
+    seen = 0
+    for x, w in weighted:
+        seen += w
+        if seen >= target:
+            return x
+    return weighted[-1][0]
+
+# Creates and returns an empty statistics state.
+
+def create_stats(k=SKETCH_K):
+    return {'count': 0, 'sum': 0.0, 'mean': 0.0, 'm2': 0.0,
+            'min': None, 'max': None, 'sketch': create_sketch(k)}
+
+# Adds the value x to the statistics state (Welford's update for the
+# mean and the sum of squared deviations 'm2').
+
+def stats_add(state, x):
+    state['count'] += 1
+    state['sum'] += x
+    delta = x - state['mean']
+    state['mean'] += delta / state['count']
+    state['m2'] += delta * (x - state['mean'])
+    if state['min'] is None or x < state['min']: state['min'] = x
+    if state['max'] is None or x > state['max']: state['max'] = x
+    sketch_add(state['sketch'], x)
+
+# Creates and returns a new statistics state combining the states a and b,
+# as if all of their values had been added to a single state.
+
+def merge_stats(a, b):
+    res = create_stats(max(a['sketch']['k'], b['sketch']['k']))
+    n = a['count'] + b['count']
+    if n == 0: return res
+    delta = b['mean'] - a['mean']
+    res['count'] = n
+    res['sum'] = a['sum'] + b['sum']
+    res['mean'] = a['mean'] + delta * b['count'] / n
+    res['m2'] = a['m2'] + b['m2'] + delta * delta * a['count'] * b['count'] / n
+    res['min'] = a['min'] if b['min'] is None or (a['min'] is not None and a['min'] <= b['min']) else b['min']
+    res['max'] = a['max'] if b['max'] is None or (a['max'] is not None and a['max'] >= b['max']) else b['max']
+    res['sketch'] = merge_sketches(a['sketch'], b['sketch'])
+    return res
+
+# returns the sample variance of the values, or None with fewer than 2 values.
+
+def stats_variance(state):
+    if state['count'] < 2: return None
+    return state['m2'] / (state['count'] - 1)
+
+def stats_stddev(state):
+    var = stats_variance(state)
+    return None if var is None else var ** 0.5
+
+# returns a dictionary with the final statistics of the state.
+# Every entry is None when the state holds no values.
+
+def stats_summary(state):
+    if state['count'] == 0:
+        return {'count': 0, 'sum': None, 'mean': None, 'stddev': None, 'min': None,
+                'max': None, 'p25': None, 'median': None, 'p75': None}
+    sketch = state['sketch']
+    return {
+        'count': state['count'],
+        'sum': state['sum'],
+        'mean': state['mean'],
+        'stddev': stats_stddev(state),
+        'min': state['min'],
+        'max': state['max'],
+        'p25': sketch_quantile(sketch, 0.25),
+        'median': sketch_quantile(sketch, 0.5),
+        'p75': sketch_quantile(sketch, 0.75),
+    }
+
+def test_stats_add():
+    state = create_stats()
+    for x in [2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]:
+        stats_add(state, x)
+    summary = stats_summary(state)
+    assert summary['count'] == 8
+    assert summary['sum'] == 40.0
+    assert summary['mean'] == 5.0
+    assert abs(summary['stddev'] - (32 / 7) ** 0.5) < 1e-9
+    assert summary['min'] == 2.0
+    assert summary['max'] == 9.0
+    assert summary['median'] == 4.5
+    assert summary['p25'] == 4.0
+    assert summary['p75'] == 5.5
+
+    assert stats_summary(create_stats())['mean'] is None
+
+def test_merge_stats():
+    a = create_stats()
+    b = create_stats()
+    whole = create_stats()
+    for i in range(100):
+        stats_add(a if i % 3 else b, float(i))
+        stats_add(whole, float(i))
+    merged = stats_summary(merge_stats(a, b))
+    expected = stats_summary(whole)
+    assert merged['count'] == 100
+    assert merged['sum'] == expected['sum']
+    assert abs(merged['mean'] - expected['mean']) < 1e-9
+    assert abs(merged['stddev'] - expected['stddev']) < 1e-9
+    assert merged['min'] == 0.0 and merged['max'] == 99.0
+    assert merged['median'] == expected['median']
+
+    assert stats_summary(merge_stats(create_stats(), a))['count'] == a['count']
+
+def test_sketch_quantile():
+    sketch = create_sketch(50)
+    n = 10000
+    for i in range(n):
+        sketch_add(sketch, float((i * 7919) % n))
+    assert sketch['count'] == n
+    assert sketch_size(sketch) == sketch['size']
+    assert sketch['size'] <= sketch['capacity']
+    assert sketch_size(sketch) < 500
+    for q in [0.1, 0.25, 0.5, 0.75, 0.9]:
+        assert abs(sketch_quantile(sketch, q) - q * n) < 0.05 * n
+
+    assert sketch_quantile(create_sketch(50), 0.5) is None
+
+if __name__ == "__main__":
+    test_stats_add()
+    test_merge_stats()
+    test_sketch_quantile()